@@ -177,7 +177,8 @@ class CosyVoiceFrontEnd:
                            'prompt_speech_feat': speech_feat, 'prompt_speech_feat_len': speech_feat_len,
                            'llm_embedding': embedding, 'flow_embedding': embedding}
         else:
-            model_input = self.spk2info[zero_shot_spk_id]
+            # NOTE copy the cached entry, cross_lingual/instruct2 will delete keys from model_input
+            model_input = self.spk2info[zero_shot_spk_id].copy()
         model_input['text'] = tts_text_token
         model_input['text_len'] = tts_text_token_len
         return model_input
@@ -0,0 +1,63 @@
+# 图形界面和测试脚本共用的推理辅助函数，只依赖torch和numpy，导入时不加载模型相关模块
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import torch
+
+
+def detect_acceleration(model_dir, fp16=False):
+    """检测模型目录中是否已有导出的JIT模型和构建好的TensorRT引擎"""
+    if not torch.cuda.is_available():
+        return False, False
+    precision = 'fp16' if fp16 else 'fp32'
+    load_jit = os.path.exists(os.path.join(model_dir, f'flow.encoder.{precision}.zip'))
+    # 引擎构建一次后由模型缓存在磁盘上，这里只在引擎已存在时默认启用，避免首次运行时长时间构建
+    load_trt = os.path.exists(os.path.join(model_dir, f'flow.decoder.estimator.{precision}.mygpu.plan'))
+    return load_jit, load_trt
+
+
+def _float_to_pcm16(samples, out):
+    """一遍完成裁剪、缩放和int16转换"""
+    for i in range(samples.shape[0]):
+        v = samples[i]
+        v = -1.0 if v < -1.0 else (1.0 if v > 1.0 else v)
+        out[i] = np.int16(v * 32767.0)
+
+
+@lru_cache(maxsize=1)
+def _pcm16_kernel():
+    """首次量化时才导入numba并编译量化函数，numba未安装时返回None"""
+    try:
+        import numba
+    except ImportError:
+        # numba为可选依赖，未安装时使用numpy完成量化
+        return None
+    # 不使用parallel=True：多个线程同时调用并行内核时，numba退回的workqueue线程层会直接终止进程
+    return numba.njit(cache=True, fastmath=True)(_float_to_pcm16)
+
+
+def to_pcm16(speech):
+    """将模型输出的音频量化为一维int16 PCM数据"""
+    # 模型输出单声道音频，形状为(1, T)或(T,)，直接展平即可，无需squeeze
+    assert speech.ndim == 1 or speech.shape[0] == 1, '只支持单声道音频'
+    if isinstance(speech, torch.Tensor):
+        # 模型输出的音频已在CPU上，转成numpy数组时共享内存，不产生拷贝
+        speech = speech.detach().reshape(-1).cpu().numpy()
+    speech = np.ascontiguousarray(speech, dtype=np.float32).reshape(-1)
+    pcm = np.empty(speech.shape, dtype=np.int16)
+    kernel = _pcm16_kernel()
+    if kernel is not None:
+        kernel(speech, pcm)
+        return pcm
+    # 缩放结果直接写入int16数组，省去astype的额外一遍拷贝
+    np.multiply(np.clip(speech, -1.0, 1.0), 32767, out=pcm, casting='unsafe')
+    return pcm
+
+
+@torch.inference_mode()
+def warmup_model(model, prompt_speech_16k, prompt_text):
+    """用短文本做一次推理并量化输出，提前完成CUDA内核、计算图和量化函数的初始化"""
+    for result in model.inference_zero_shot("你好。", prompt_text, prompt_speech_16k, stream=False):
+        to_pcm16(result['tts_speech'])
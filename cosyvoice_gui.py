@@ -1,176 +1,481 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import importlib.util
+import math
 import os
+import queue
+import re
 import sys
+import threading
 import time
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import lru_cache
 from pathlib import Path
+
+# 使用可扩展的显存段，减少长时间运行后不同长度的合成造成的显存碎片，需在初始化CUDA之前设置
+if sys.platform.startswith("linux"):
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
 import numpy as np
 import torch
+import torchaudio
 import soundfile as sf
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QTextEdit, QPushButton, 
                             QComboBox, QFileDialog, QGroupBox, QRadioButton,
-                            QSlider, QMessageBox, QLineEdit, QButtonGroup, QStatusBar)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QUrl, QFileInfo
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+                            QSlider, QMessageBox, QLineEdit, QButtonGroup, QStatusBar,
+                            QCheckBox, QSpinBox)
+from PyQt5.QtGui import QDesktopServices
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QUrl, QFileInfo, QIODevice
+from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent, QAudio, QAudioFormat, QAudioOutput
 
 # 确保脚本的目录存在于Python路径中
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(current_dir, 'third_party/Matcha-TTS'))
 
-# 导入CosyVoice相关模块
+# 导入CosyVoice相关模块，CosyVoice2依赖较多，在模型加载线程中再导入
 try:
-    from cosyvoice.cli.cosyvoice import CosyVoice2
     from cosyvoice.utils.file_utils import load_wav
+    from cosyvoice.utils.inference_utils import detect_acceleration, to_pcm16, warmup_model
 except ImportError as e:
     print(f"导入CosyVoice模块失败: {e}")
     print("请确保已安装所有依赖项，包括modelscope, hyperpyyaml等")
     sys.exit(1)
 
-def process_text_by_lines(text):
-    """将文本按行分割，并组合成不超过150字的片段"""
-    segments = []
-    current_segment = ""
-    max_length = 150
-    
-    # 按行分割文本
-    lines = text.strip().split('\n')
+# 句末标点之后的切分位置，英文句号需后接空白，避免切开小数
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?])|(?<=\.)(?=\s)')
+# 分句标点之后的切分位置，用于仍然超长的句子
+CLAUSE_END_PATTERN = re.compile(r'(?<=[，；：、,;:])')
+
+
+def split_sentences(line, pattern=SENTENCE_END_PATTERN):
+    """按句末标点切分一行文本，保留标点"""
+    return [s.strip() for s in pattern.split(line) if s.strip()]
+
+
+def split_long_line(line, max_length):
+    """超长的行先按句子切分，仍然超长的句子再按分句标点切分"""
+    if len(line) <= max_length:
+        return [line]
+    parts = []
+    for sentence in split_sentences(line):
+        parts.extend(split_sentences(sentence, CLAUSE_END_PATTERN) if len(sentence) > max_length else [sentence])
+    return parts
+
+
+def process_text_by_lines(text, max_length=150):
+    """将文本按行分割，并组合成长度均衡的片段，只有不含标点的超长分句会超过max_length字"""
+    # 按行分割文本，超长的行再切分，跳过空行
+    lines = []
+    for line in text.strip().split('\n'):
+        lines.extend(split_long_line(line.strip(), max_length))
+    lines = [line for line in lines if line]
+    if not lines:
+        return []
     
+    segments = []
+    current_parts = []  # 当前片段包含的行，最后一次性用换行符连接
+    current_len = 0     # 当前片段连接后的长度
+    # 从当前片段开始到文本末尾的长度，每个片段开始时据此重新估算剩余片段数和目标长度，
+    # 避免行边界迫使片段数多于最初估计时最后剩下一个很短的片段
+    remaining_len = sum(len(line) for line in lines) + len(lines) - 1
+    target_len = remaining_len / math.ceil(remaining_len / max_length)
     for line in lines:
-        line = line.strip()
-        if not line:  # 跳过空行
-            continue
-            
-        # 如果添加当前行会超出长度限制
-        if len(current_segment) + len(line) + 1 > max_length:  # +1 是为了可能添加的换行符
-            if current_segment:
-                segments.append(current_segment)
-            current_segment = line
-        else:
-            # 如果不是第一行，添加换行符
-            if current_segment:
-                current_segment += "\n" + line
-            else:
-                current_segment = line
+        # 如果不是第一行，需要计入换行符
+        new_len = current_len + len(line) + 1 if current_parts else len(line)
+        # 超出长度限制，或加入当前行后比不加更偏离目标长度时，开始新的片段
+        if current_parts and (new_len > max_length or abs(new_len - target_len) > abs(current_len - target_len)):
+            segments.append("\n".join(current_parts))
+            remaining_len -= current_len + 1
+            target_len = remaining_len / math.ceil(remaining_len / max_length)
+            current_parts = []
+            new_len = len(line)
+        current_parts.append(line)
+        current_len = new_len
     
     # 添加最后一个段落
-    if current_segment:
-        segments.append(current_segment)
+    if current_parts:
+        segments.append("\n".join(current_parts))
         
     return segments
 
 
-class SynthesisThread(QThread):
-    """语音合成线程，防止界面卡死"""
+PROMPT_CACHE_SIZE = 8  # 最多缓存的参考音频数量
+TEXT_CACHE_SIZE = 64   # 最多缓存的文本前端结果数量
+
+
+def prompt_file_key(prompt_file):
+    """返回参考音频的缓存键，文件被修改后键随之变化"""
+    stat = os.stat(prompt_file)
+    return os.path.abspath(prompt_file), stat.st_mtime_ns, stat.st_size
+
+
+def fast_load_wav(path, target_sr=16000):
+    """读取参考音频并转为单声道，CUDA可用时在GPU上重采样"""
+    if torch.cuda.is_available():
+        try:
+            speech, sample_rate = torchaudio.load(path, backend='soundfile')
+            speech = speech.mean(dim=0, keepdim=True)
+            if sample_rate == target_sr:
+                return speech
+            assert sample_rate > target_sr, 'wav sample rate {} must be greater than {}'.format(sample_rate, target_sr)
+            # 前端的特征提取在CPU上进行，重采样后拷回主机
+            speech = torchaudio.functional.resample(speech.to('cuda', non_blocking=True), sample_rate, target_sr)
+            return speech.cpu()
+        except RuntimeError:
+            pass
+    return load_wav(path, target_sr)
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def cached_load_wav(path, mtime_ns, size):
+    """按(路径, 修改时间, 大小)缓存解码后的16k参考音频"""
+    return fast_load_wav(path, 16000)
+
+
+@lru_cache(maxsize=32)
+def load_prompt_txt(path):
+    """读取内置音色对应的参考文本，选中该音色时才读取"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def enable_text_frontend_cache(frontend, maxsize=TEXT_CACHE_SIZE):
+    """缓存文本正则化和分词结果，重复合成相同文本时跳过文本前端"""
+    text_normalize = frontend.text_normalize
+    extract_text_token = frontend._extract_text_token
+    cached_text_normalize = lru_cache(maxsize=maxsize)(text_normalize)
+    cached_extract_text_token = lru_cache(maxsize=maxsize)(extract_text_token)
+
+    # 流式输入的文本生成器无法缓存，仍走原始流程
+    def text_normalize_wrapper(text, split=True, text_frontend=True):
+        if not isinstance(text, str):
+            return text_normalize(text, split=split, text_frontend=text_frontend)
+        return cached_text_normalize(text, split, text_frontend)
+
+    def extract_text_token_wrapper(text):
+        if not isinstance(text, str):
+            return extract_text_token(text)
+        # 缓存的张量在各次调用间共享；模型推理时按token重新生成长度张量，不会原地修改它们
+        return cached_extract_text_token(text)
+
+    frontend.text_normalize = text_normalize_wrapper
+    frontend._extract_text_token = extract_text_token_wrapper
+
+
+def pretokenize_segments(frontend, segments, stop, limit=TEXT_CACHE_SIZE // 2):
+    """在stop()返回True之前提前完成各片段的文本正则化和分词，结果存入文本前端缓存"""
+    # 只处理缓存放得下的数量，避免尚未用到的结果被提前淘汰
+    count = 0
+    for segment in segments:
+        if stop():
+            return
+        for sentence in frontend.text_normalize(segment, split=True, text_frontend=True):
+            frontend._extract_text_token(sentence)
+            count += 1
+        if count >= limit:
+            return
+
+
+def configure_torch_backends():
+    """开启TF32矩阵运算，FP32推理时可利用Tensor Core"""
+    if not torch.cuda.is_available():
+        return
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+    torch.set_float32_matmul_precision('high')
+    # 每句文本的长度都不同，开启cudnn.benchmark会对每个新形状重新测速，反而更慢
+    torch.backends.cudnn.benchmark = False
+
+
+def prefetch_model_files(model_path):
+    """提示操作系统预读模型权重文件，减少加载时的缺页等待"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for weight_file in Path(model_path).glob("*.pt"):
+        fd = os.open(weight_file, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+# CosyVoice2Model中加载各加速组件的方法名 -> 显示名称，方法名与CosyVoice2的参数名相同
+ACCELERATION_NAMES = {'load_jit': "JIT", 'load_trt': "TensorRT", 'load_vllm': "vLLM"}
+
+
+def failed_acceleration_option(exc):
+    """从异常的调用栈中找出加载失败的加速组件，返回对应的参数名，不是加速组件出错时返回None"""
+    failed = None
+    tb = exc.__traceback__
+    while tb is not None:
+        name = tb.tb_frame.f_code.co_name
+        if name in ACCELERATION_NAMES:
+            failed = name
+        tb = tb.tb_next
+    return failed
+
+
+class ModelLoaderThread(QThread):
+    """模型加载线程，加载和预热模型时不阻塞界面"""
+    model_ready = pyqtSignal(object)  # 加载完成信号，携带模型实例
+    progress = pyqtSignal(str)        # 进度更新信号
+    error = pyqtSignal(str)           # 错误信号
+
+    def __init__(self, model_path, load_jit, load_trt, load_vllm, fp16):
+        super().__init__()
+        self.model_path = model_path
+        self.load_jit = load_jit
+        self.load_trt = load_trt
+        self.load_vllm = load_vllm
+        self.fp16 = fp16
+
+    def run(self):
+        try:
+            from cosyvoice.cli.cosyvoice import CosyVoice2
+        except ImportError as e:
+            self.error.emit(f"导入CosyVoice模块失败: {e}，请确保已安装所有依赖项，包括modelscope, hyperpyyaml等")
+            return
+        
+        try:
+            if os.path.isdir(self.model_path):
+                prefetch_model_files(self.model_path)
+            options = {'load_jit': self.load_jit, 'load_trt': self.load_trt,
+                       'load_vllm': self.load_vllm, 'fp16': self.fp16}
+            while True:
+                try:
+                    model = CosyVoice2(self.model_path, **options)
+                    break
+                except Exception as e:
+                    # 加速组件（JIT模型、TensorRT引擎、vLLM）不可用时，只关闭出错的那一项，其余选项保持不变
+                    failed = failed_acceleration_option(e)
+                    if failed is None or not options[failed]:
+                        raise
+                    self.progress.emit(f"{ACCELERATION_NAMES[failed]}加载失败({e})，关闭该选项后重新加载模型...")
+                    options[failed] = False
+                    if torch.cuda.is_available():
+                        torch.cuda.empty_cache()
+            enable_text_frontend_cache(model.frontend)
+            self.progress.emit("正在预热模型...")
+            # 用内置参考音频做一次短文本推理
+            warmup_prompt_file = os.path.join(current_dir, "asset", "zero_shot_prompt.wav")
+            if os.path.exists(warmup_prompt_file):
+                warmup_model(model, fast_load_wav(warmup_prompt_file, 16000), "希望你以后能够做的比我还好呦。")
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            self.model_ready.emit(model)
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class AudioWriter:
+    """后台写WAV文件的线程，合成线程只需把PCM数据放入队列，不必等待编码和磁盘写入"""
+
+    def __init__(self, maxsize=4):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def open(self, path, sample_rate):
+        """开始写入一个新的单声道16位PCM WAV文件"""
+        self.error = None
+        self.queue.put(('open', path, sample_rate))
+
+    def write(self, pcm):
+        """追加一段int16 PCM数据"""
+        self.queue.put(('write', pcm))
+
+    def close(self):
+        """关闭当前文件，等待队列中的数据全部写入后返回"""
+        done = threading.Event()
+        self.queue.put(('close', done))
+        done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def _write_loop(self):
+        sound_file = None
+        while True:
+            command, *args = self.queue.get()
+            try:
+                if command == 'open':
+                    sound_file = sf.SoundFile(args[0], 'w', args[1], channels=1, subtype='PCM_16')
+                elif command == 'write':
+                    # 出错后丢弃当前文件剩余的数据，错误在close时抛出
+                    if sound_file is not None and self.error is None:
+                        sound_file.write(args[0])
+                elif sound_file is not None:
+                    sound_file.close()
+                    sound_file = None
+            except Exception as e:
+                self.error = e
+            finally:
+                if command == 'close':
+                    args[0].set()
+
+
+class AudioStreamDevice(QIODevice):
+    """供QAudioOutput拉取的PCM数据源，合成线程产生的音频块追加到末尾"""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self.input_finished = False
+        self.open(QIODevice.ReadOnly)
+
+    def append(self, data):
+        """追加一段PCM数据"""
+        self._buffer.extend(data)
+        self.readyRead.emit()
+
+    def finish(self):
+        """标记不会再有新的数据"""
+        self.input_finished = True
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        return len(self._buffer) + super().bytesAvailable()
+
+    def atEnd(self):
+        return self.input_finished and not self._buffer
+
+    def readData(self, maxlen):
+        data = bytes(self._buffer[:maxlen])
+        del self._buffer[:maxlen]
+        return data
+
+    def writeData(self, data):
+        return -1
+
+
+# 一次合成请求的全部参数
+SynthesisJob = namedtuple('SynthesisJob', ['model', 'mode', 'text', 'prompt_file', 'prompt_text', 'instruct_text',
+                                           'output_dir', 'prompt_cache', 'batch_size', 'segment_length', 'stream'])
+
+
+class SynthesisWorker(QThread):
+    """常驻的语音合成线程，依次处理界面提交的合成请求，防止界面卡死"""
     finished = pyqtSignal(str)  # 完成信号，携带生成的音频文件路径
     progress = pyqtSignal(str)  # 进度更新信号
     error = pyqtSignal(str)     # 错误信号
+    audio_chunk = pyqtSignal(np.ndarray)  # 流式合成的音频块，int16 PCM
+    audio_ready = pyqtSignal(str, int, list)  # 已保存的音频文件路径、采样率及按顺序排列的int16 PCM片段
 
-    def __init__(self, model, mode, text, prompt_file, prompt_text, instruct_text, output_dir):
+    def __init__(self):
         super().__init__()
-        self.model = model
-        self.mode = mode
-        self.text = text
-        self.prompt_file = prompt_file
-        self.prompt_text = prompt_text
-        self.instruct_text = instruct_text
-        self.output_dir = output_dir
+        self.jobs = queue.Queue()
+        # 写文件放在独立线程，推理线程不必等待磁盘
+        self.audio_writer = AudioWriter()
+        # 准备参考音频的后台线程，与文本切分并行
+        self.prompt_executor = ThreadPoolExecutor(max_workers=1)
         self.output_path = None
 
+    def submit(self, job):
+        """提交一个合成请求"""
+        self.jobs.put(job)
+
+    def stop(self):
+        """处理完已提交的请求后退出线程"""
+        self.jobs.put(None)
+
     def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            self._load_job(job)
+            # 等待下一个请求期间不再持有本次请求及其模型，切换模型时旧模型的显存才能释放
+            job = None
+            try:
+                self._run_job()
+            finally:
+                self._clear_job()
+        self.prompt_executor.shutdown()
+
+    def _load_job(self, job):
+        """载入本次合成请求的参数"""
+        self.model = job.model
+        self.mode = job.mode
+        self.text = job.text
+        self.prompt_file = job.prompt_file
+        self.prompt_text = job.prompt_text
+        self.instruct_text = job.instruct_text
+        self.output_dir = job.output_dir
+        self.prompt_cache = job.prompt_cache
+        self.batch_size = job.batch_size
+        self.segment_length = job.segment_length
+        self.stream = job.stream
+        self.output_path = None
+        
+        # 合成模式 -> (推理方法, 参考音频之前的附加参数)
+        self.inference_fn, self.inference_args = {
+            "zero_shot": (job.model.inference_zero_shot, (job.prompt_text,)),
+            "cross_lingual": (job.model.inference_cross_lingual, ()),
+            "instruct": (job.model.inference_instruct2, (job.instruct_text,)),
+        }.get(job.mode, (None, ()))
+
+    def _clear_job(self):
+        """丢弃本次合成请求的参数，包括模型和绑定到模型的推理方法"""
+        for field in SynthesisJob._fields:
+            setattr(self, field, None)
+        self.inference_fn, self.inference_args = None, ()
+
+    def _run_job(self):
         try:
-            os.makedirs(self.output_dir, exist_ok=True)
-            
             # 为输出文件生成唯一文件名
             timestamp = int(time.time())
             self.output_path = os.path.join(self.output_dir, f"{self.mode}_{timestamp}.wav")
             
-            # 加载参考音频
-            if self.prompt_file:
-                self.progress.emit("正在加载参考音频...")
-                prompt_speech_16k = load_wav(self.prompt_file, 16000)
-            else:
-                prompt_speech_16k = None
+            # 参考音频的加载和特征提取在后台线程进行，同时在当前线程切分文本
+            prompt_future = self.prompt_executor.submit(self._prepare_prompt) if self.prompt_file else None
                 
             # 将长文本分割成多个片段
-            text_segments = process_text_by_lines(self.text)
+            text_segments = process_text_by_lines(self.text, self.segment_length)
             
             # 显示更详细的分割信息
             segment_info = "\n".join([f"片段{i+1}: 字符数{len(s)}" for i, s in enumerate(text_segments)])
             self.progress.emit(f"文本已分割为{len(text_segments)}个片段:\n{segment_info}")
             
-            # 存储每个片段合成的音频
-            audio_segments = []
+            # 只利用等待参考音频的时间分词，参考音频就绪（如命中缓存）后立即开始推理，不推迟首段音频
+            if prompt_future is not None:
+                pretokenize_segments(self.model.frontend, text_segments, prompt_future.done)
             
-            # 根据模式执行不同的合成方法
-            for i, segment in enumerate(text_segments):
-                # 显示片段内容的前30个字符，但如果内容包含换行符，只显示第一行
-                display_text = segment.split('\n')[0] if '\n' in segment else segment[:30]
-                self.progress.emit(f"开始合成第{i+1}/{len(text_segments)}个片段: {display_text}...")
-                
-                if self.mode == "zero_shot" and prompt_speech_16k is not None:
-                    for j, result in enumerate(self.model.inference_zero_shot(
-                            segment, self.prompt_text, prompt_speech_16k, stream=False)):
-                        if j == 0:
-                            audio_segments.append(result['tts_speech'])
-                            break
-                            
-                elif self.mode == "cross_lingual" and prompt_speech_16k is not None:
-                    for j, result in enumerate(self.model.inference_cross_lingual(
-                            segment, prompt_speech_16k, stream=False)):
-                        if j == 0:
-                            audio_segments.append(result['tts_speech'])
-                            break
-                            
-                elif self.mode == "instruct" and prompt_speech_16k is not None:
-                    for j, result in enumerate(self.model.inference_instruct2(
-                            segment, self.instruct_text, prompt_speech_16k, stream=False)):
-                        if j == 0:
-                            audio_segments.append(result['tts_speech'])
-                            break
-                else:
-                    self.error.emit(f"无法执行{self.mode}模式，请检查参数设置")
-                    return
-            # 合并所有音频片段
-            if audio_segments:
-                self.progress.emit("正在合并所有音频片段...")
-                
-                if len(audio_segments) == 1:
-                    combined_speech = audio_segments[0]
-                else:
-                    # 确保所有片段都是张量或都是numpy数组
-                    if isinstance(audio_segments[0], torch.Tensor):
-                        # 如果是张量，在时间维度上拼接
-                        combined_speech = torch.cat(audio_segments, dim=1 if len(audio_segments[0].shape) > 1 else 0)
-                    else:
-                        # 如果是numpy数组，在时间维度上拼接
-                        combined_speech = np.concatenate(audio_segments, axis=0)
-                
-                # 记录合并后的总长度
-                total_len = combined_speech.shape[-1] if isinstance(combined_speech, torch.Tensor) else len(combined_speech)
-                
-                # 检查合并后的音频数据是否有效
-                if total_len == 0:
-                    self.error.emit("错误: 合并后的音频长度为0，请检查音频片段")
-                    return
-                
-                # 保存合并后的音频
-                self._save_audio(combined_speech, self.output_path)
-                # 显示合并后的音频详细信息
-                if isinstance(combined_speech, torch.Tensor):
-                    samples = combined_speech.shape[-1]
-                else:
-                    samples = len(combined_speech)
-                duration = samples / self.model.sample_rate
-                
-                # 验证保存的音频文件
-                if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0:
-                    self.error.emit("错误: 保存的音频文件无效，请检查磁盘空间和权限")
+            prompt_speech_16k, zero_shot_spk_id = prompt_future.result() if prompt_future else (None, None)
+            
+            if prompt_speech_16k is None or self.inference_fn is None:
+                self.error.emit(f"无法执行{self.mode}模式，请检查参数设置")
+                return
+            
+            if self.stream:
+                # 流式合成，边生成边写入文件并推送给播放器
+                if self._synthesize_stream(text_segments, prompt_speech_16k, zero_shot_spk_id) == 0:
+                    self.error.emit("没有生成任何音频片段")
                     return
-            else:
+                self.progress.emit("语音合成完成!")
+                self.finished.emit(self.output_path)
+                return
+            
+            # 多个片段同时提交给模型，模型内部按会话隔离推理状态
+            pcm_segments = self._synthesize_segments(text_segments, prompt_speech_16k, zero_shot_spk_id)
+            if not pcm_segments:
                 self.error.emit("没有生成任何音频片段")
                 return
+            
+            # 验证保存的音频文件
+            if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0:
+                self.error.emit("错误: 保存的音频文件无效，请检查磁盘空间和权限")
+                return
+            
+            # PCM片段直接交给界面播放，无需再解码刚写入的文件，也不必拼接成一整段
+            self.audio_ready.emit(self.output_path, self.model.sample_rate, pcm_segments)
+            self.progress.emit(f"已保存音频到: {self.output_path}")
                 
             self.progress.emit("语音合成完成!")
             self.finished.emit(self.output_path)
@@ -178,27 +483,145 @@ class SynthesisThread(QThread):
         except Exception as e:
             self.error.emit(f"合成过程中出错: {str(e)}")
             
-    def _save_audio(self, speech, output_path):
-        """保存音频文件"""
-        if isinstance(speech, torch.Tensor):
-            speech = speech.squeeze().cpu().numpy()
-        
-        if len(speech.shape) > 1 and speech.shape[0] == 1:
-            speech = speech.squeeze(0)
-        
-        sf.write(output_path, speech, self.model.sample_rate)
-        self.progress.emit(f"已保存音频到: {output_path}")
+    def _prepare_prompt(self):
+        """加载参考音频并取得其特征对应的说话人ID"""
+        self.progress.emit("正在加载参考音频...")
+        prompt_key = prompt_file_key(self.prompt_file)
+        prompt_speech_16k = cached_load_wav(*prompt_key)
+        
+        # 参考音频特征只提取一次，之后通过zero_shot_spk_id复用
+        if self.mode == "zero_shot":
+            spk_prompt_text = self.model.frontend.text_normalize(self.prompt_text, split=False, text_frontend=True)
+        elif self.mode == "instruct":
+            spk_prompt_text = self.instruct_text + '<|endofprompt|>'
+        else:
+            spk_prompt_text = ""
+        return prompt_speech_16k, self._get_prompt_spk_id(prompt_key, spk_prompt_text, prompt_speech_16k)
+        
+    def _inference(self, segment, prompt_speech_16k, zero_shot_spk_id, stream):
+        """根据模式调用对应的合成方法，返回模型输出的迭代器"""
+        return self.inference_fn(segment, *self.inference_args, prompt_speech_16k,
+                                 zero_shot_spk_id=zero_shot_spk_id, stream=stream)
+        
+    def _emit_segment_start(self, index, total, segment):
+        """发送开始合成某个片段的进度信息"""
+        # 显示片段内容的前30个字符，但如果内容包含换行符，只显示第一行
+        display_text = segment.split('\n')[0] if '\n' in segment else segment[:30]
+        self.progress.emit(f"开始合成第{index+1}/{total}个片段: {display_text}...")
+        
+    @torch.inference_mode()
+    def _synthesize_segment(self, index, total, segment, prompt_speech_16k, zero_shot_spk_id):
+        """合成单个文本片段，按顺序返回模型逐句生成的音频"""
+        self._emit_segment_start(index, total, segment)
+        
+        # 模型会把较长的片段再切分成多句，逐句返回音频
+        # 用完立即关闭生成器，尽早释放其持有的显存
+        with closing(self._inference(segment, prompt_speech_16k, zero_shot_spk_id, stream=False)) as results:
+            return [result['tts_speech'] for result in results]
+        
+    @torch.inference_mode()
+    def _synthesize_stream(self, text_segments, prompt_speech_16k, zero_shot_spk_id):
+        """按顺序流式合成所有片段，音频块同时写入文件和发送给播放器，返回总采样点数"""
+        total_samples = 0
+        self.audio_writer.open(self.output_path, self.model.sample_rate)
+        try:
+            for i, segment in enumerate(text_segments):
+                self._emit_segment_start(i, len(text_segments), segment)
+                with closing(self._inference(segment, prompt_speech_16k, zero_shot_spk_id, stream=True)) as results:
+                    for result in results:
+                        chunk = to_pcm16(result['tts_speech'])
+                        self.audio_writer.write(chunk)
+                        self.audio_chunk.emit(chunk)
+                        total_samples += len(chunk)
+        finally:
+            # 等待所有音频块落盘后才算合成完成
+            self.audio_writer.close()
+        if total_samples:
+            self.progress.emit(f"已保存音频到: {self.output_path}")
+        return total_samples
+        
+    @torch.inference_mode()
+    def _get_prompt_spk_id(self, prompt_key, prompt_text, prompt_speech_16k):
+        """获取参考音频特征对应的说话人ID，未命中缓存时提取特征并注册到模型"""
+        cache_key = prompt_key + (prompt_text,)
+        if cache_key in self.prompt_cache:
+            self.prompt_cache.move_to_end(cache_key)
+            return self.prompt_cache[cache_key]
+        
+        self.progress.emit("正在提取参考音频特征...")
+        spk_id = f"gui_prompt_{uuid.uuid4().hex}"
+        self.model.add_zero_shot_spk(prompt_text, prompt_speech_16k, spk_id)
+        self.prompt_cache[cache_key] = spk_id
+        
+        # 超出缓存容量时淘汰最久未使用的特征
+        while len(self.prompt_cache) > PROMPT_CACHE_SIZE:
+            _, old_spk_id = self.prompt_cache.popitem(last=False)
+            self.model.frontend.spk2info.pop(old_spk_id, None)
+        return spk_id
+        
+    def _synthesize_segments(self, text_segments, prompt_speech_16k, zero_shot_spk_id):
+        """并行合成所有片段，并按原文顺序边合成边写入文件，返回各片段的int16 PCM数据"""
+        pcm_segments = []
+        max_workers = max(1, min(self.batch_size, len(text_segments)))
+        self.audio_writer.open(self.output_path, self.model.sample_rate)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self._synthesize_segment, i, len(text_segments), segment,
+                                           prompt_speech_16k, zero_shot_spk_id)
+                           for i, segment in enumerate(text_segments)]
+                # 前面的片段一完成就交给写文件线程，写入与后续片段的合成重叠进行
+                # 各句音频依次写入，不再先拼接成整段
+                for future in futures:
+                    for speech in future.result():
+                        pcm = to_pcm16(speech)
+                        self.audio_writer.write(pcm)
+                        pcm_segments.append(pcm)
+        finally:
+            # 等待所有片段落盘后才算合成完成
+            self.audio_writer.close()
+        return pcm_segments
 
 
 class CosyVoiceGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        configure_torch_backends()
         self.model = None
         self.model_loaded = False
+        self.model_cache = {}  # (模型路径, fp16, jit, trt, vllm) -> 已加载的模型
+        # (参考音频, 参考文本) -> 已注册的说话人ID，说话人只注册在当前模型上，每个模型各用一份
+        self.prompt_cache = OrderedDict()
         self.current_audio_path = None
-        self.player = QMediaPlayer()
+        self.current_pcm = None  # (音频文件路径, 采样率, int16 PCM片段列表)，最近一次合成的音频数据
+        self.player = QMediaPlayer()  # 仅用于播放内置音色等外部音频文件
+        # 播放结束后恢复按钮状态，信号只连接一次
+        self.player.stateChanged.connect(self.player_state_changed)
+        self.audio_output = None  # 直接播放PCM数据的音频输出
+        self.stream_device = None
+        self.synthesizing = False  # 是否有已提交但尚未结束的合成任务
+        self.streaming = False  # 是否正在流式合成
+        self.stream_chunks = []
+        self.stream_sample_rate = None  # 流式合成所用模型的采样率，与stream_chunks一起保存
+        self.model_loader = None
+        self._prompt_ok = False  # 自定义参考音频路径是否指向已存在的文件
+        
+        # 输出目录只在启动时创建一次
+        self.output_dir = Path(current_dir) / "synthesis_outputs"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 常驻的合成线程，信号只连接一次
+        self.synthesis_worker = SynthesisWorker()
+        self.synthesis_worker.audio_chunk.connect(self.on_audio_chunk)
+        self.synthesis_worker.audio_ready.connect(self.on_audio_ready)
+        self.synthesis_worker.progress.connect(self.update_status)
+        self.synthesis_worker.error.connect(self.show_error)
+        self.synthesis_worker.finished.connect(self.synthesis_finished)
+        self.synthesis_worker.start()
         self.initUI()
-        #self.load_model()
+        
+        # 启动时若默认模型目录存在，则在后台开始加载
+        if os.path.isdir(self.model_path_edit.text().strip()):
+            self.start_model_loading(notify=False)
         
     def initUI(self):
         """初始化界面"""
@@ -219,6 +642,25 @@ class CosyVoiceGUI(QMainWindow):
         model_layout.addWidget(QLabel("模型路径:"))
         model_layout.addWidget(self.model_path_edit)
         
+        # 加速选项，仅在CUDA可用时可选；JIT和TensorRT只在模型目录中已有导出文件时默认开启
+        cuda_available = torch.cuda.is_available()
+        self.jit_check = QCheckBox("JIT")
+        self.trt_check = QCheckBox("TensorRT")
+        self.trt_check.setToolTip("模型目录中没有TensorRT引擎时，首次加载需要较长时间构建")
+        self.fp16_check = QCheckBox("FP16")
+        self.fp16_check.setChecked(cuda_available)
+        for check in [self.jit_check, self.trt_check, self.fp16_check]:
+            check.setEnabled(cuda_available)
+            model_layout.addWidget(check)
+        self.update_acceleration_checks()
+        self.model_path_edit.editingFinished.connect(self.update_acceleration_checks)
+        self.fp16_check.toggled.connect(self.update_acceleration_checks)
+        # vLLM把同时合成的多个片段合并成一个批次解码，需单独安装vllm
+        self.vllm_check = QCheckBox("vLLM")
+        self.vllm_check.setEnabled(cuda_available and importlib.util.find_spec("vllm") is not None)
+        self.vllm_check.setToolTip("使用vLLM批量解码同时合成的片段")
+        model_layout.addWidget(self.vllm_check)
+        
         self.load_model_btn = QPushButton("加载模型")
         self.load_model_btn.clicked.connect(self.load_model)
         model_layout.addWidget(self.load_model_btn)
@@ -312,8 +754,15 @@ class CosyVoiceGUI(QMainWindow):
         
         # 扫描AudioSamples目录获取所有wav文件和对应文本
         audio_samples_dir = os.path.join(os.path.dirname(__file__), "AudioSamples")
-        self.wav_files = [f for f in os.listdir(audio_samples_dir) if f.endswith('.wav')]
-        self.txt_files = [f for f in os.listdir(audio_samples_dir) if f.endswith('.txt')]
+        # 只遍历一次目录，文本文件按文件名记录完整路径
+        self.wav_files = []
+        txt_paths = {}
+        with os.scandir(audio_samples_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.wav'):
+                    self.wav_files.append(entry.name)
+                elif entry.name.endswith('.txt'):
+                    txt_paths[entry.name] = entry.path
         
         # 创建音色名称到文件的映射
         self.voice_mapping = {}
@@ -325,17 +774,10 @@ class CosyVoiceGUI(QMainWindow):
                 base_name = wav_file.split('.')[0]
                 name_part = wav_file.split('_')[1].split('.')[0]
                 
-                # 查找对应的txt文件
-                txt_file = f"{base_name}.txt"
-                if txt_file in self.txt_files:
-                    with open(os.path.join(audio_samples_dir, txt_file), 'r', encoding='utf-8') as f:
-                        prompt_text = f.read().strip()
-                else:
-                    prompt_text = ""
-                
+                # 只记录对应txt文件的路径，选中音色时再读取
                 self.voice_mapping[name_part] = {
                     'wav': wav_file,
-                    'txt': prompt_text
+                    'txt_path': txt_paths.get(f"{base_name}.txt")
                 }
                 voice_names.append(name_part)
             except IndexError:
@@ -364,6 +806,7 @@ class CosyVoiceGUI(QMainWindow):
         
         prompt_file_layout = QHBoxLayout()
         self.prompt_file_edit = QLineEdit()
+        self.prompt_file_edit.textChanged.connect(self.on_prompt_file_changed)
         self.prompt_file_edit.setPlaceholderText("参考音频文件路径")
         self.prompt_file_btn = QPushButton("选择文件")
         self.prompt_file_btn.clicked.connect(self.select_prompt_file)
@@ -441,6 +884,27 @@ class CosyVoiceGUI(QMainWindow):
         self.open_output_dir_btn = QPushButton("打开输出目录")
         self.open_output_dir_btn.clicked.connect(self.open_output_directory)
         
+        # 同时合成的片段数
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 8)
+        self.batch_size_spin.setValue(2 if torch.cuda.is_available() else 1)
+        self.batch_size_spin.setToolTip("长文本分段后同时合成的片段数")
+        control_layout.addWidget(QLabel("并行片段数:"))
+        control_layout.addWidget(self.batch_size_spin)
+        
+        # 分段的最大长度
+        self.segment_length_spin = QSpinBox()
+        self.segment_length_spin.setRange(50, 300)
+        self.segment_length_spin.setSingleStep(10)
+        self.segment_length_spin.setValue(150)
+        self.segment_length_spin.setToolTip("长文本按句子切分后组合成长度接近的片段，每个片段不超过该字数")
+        control_layout.addWidget(QLabel("片段长度:"))
+        control_layout.addWidget(self.segment_length_spin)
+        
+        self.stream_check = QCheckBox("流式播放")
+        self.stream_check.setToolTip("边合成边播放，缩短首次出声的等待时间")
+        control_layout.addWidget(self.stream_check)
+        
         control_layout.addWidget(self.synthesize_btn)
         control_layout.addWidget(self.play_btn)
         control_layout.addWidget(self.stop_btn)
@@ -455,6 +919,13 @@ class CosyVoiceGUI(QMainWindow):
         self.log_text.setPlaceholderText("合成过程信息将在这里显示...")
         log_layout.addWidget(self.log_text)
         log_group.setLayout(log_layout)
+        
+        # 日志先缓存起来，每100ms合并写入一次，避免每条消息都触发重新排版
+        self.pending_logs = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setSingleShot(True)
+        self.log_timer.setInterval(100)
+        self.log_timer.timeout.connect(self.flush_log)
         main_layout.addWidget(log_group)
         
         # 状态栏
@@ -462,32 +933,96 @@ class CosyVoiceGUI(QMainWindow):
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("欢迎使用CosyVoice语音合成器")
         
+        # 合成模式按钮 -> (模式名, 该模式必填的输入项, 未填写时的提示)
+        # 跨语言模式和指令模式不需要参考文本
+        self.mode_table = {
+            self.zero_shot_radio: ("zero_shot", "prompt_text", "零样本克隆模式需要输入参考文本"),
+            self.cross_lingual_radio: ("cross_lingual", None, None),
+            self.instruct_radio: ("instruct", "instruct_text", "指令模式需要输入指令文本"),
+        }
+        
+        # 输入项 -> 输入框，内容变化时标记为脏，点击合成时只重新读取变化过的输入
+        self.input_widgets = {
+            "text": self.text_edit,
+            "prompt_file": self.prompt_file_edit,
+            "prompt_text": self.prompt_text_edit,
+            "instruct_text": self.instruct_text_edit,
+        }
+        self.input_values = {}
+        self.dirty_inputs = set(self.input_widgets)
+        for name, widget in self.input_widgets.items():
+            widget.textChanged.connect(lambda *args, name=name: self.dirty_inputs.add(name))
+        
         # 设置主布局
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
         
+    def update_acceleration_checks(self):
+        """根据模型目录中已有的JIT模型和TensorRT引擎勾选对应的加速选项"""
+        load_jit, load_trt = detect_acceleration(self.model_path_edit.text().strip(), self.fp16_check.isChecked())
+        self.jit_check.setChecked(load_jit)
+        self.trt_check.setChecked(load_trt)
+        
     def load_model(self):
         """加载模型"""
+        self.start_model_loading(notify=True)
+        
+    def start_model_loading(self, notify):
+        """在后台线程中加载模型，notify为True时加载结束后弹窗提示"""
         model_path = self.model_path_edit.text().strip()
         if not model_path:
             QMessageBox.warning(self, "警告", "请输入有效的模型路径")
             return
+        
+        fp16 = self.fp16_check.isChecked()
+        load_jit = self.jit_check.isChecked()
+        load_trt = self.trt_check.isChecked()
+        load_vllm = self.vllm_check.isChecked()
+        cache_key = (model_path, fp16, load_jit, load_trt, load_vllm)
+        
+        # 相同路径和加速选项的模型已加载，直接复用
+        if cache_key in self.model_cache:
+            self.model = self.model_cache[cache_key]
+            self.model_loaded = True
+            self.synthesize_btn.setEnabled(True)
+            self.statusBar.showMessage(f"模型已加载: {model_path}")
+            return
             
         self.statusBar.showMessage("正在加载模型，请稍候...")
         self.load_model_btn.setEnabled(False)
+        self.synthesize_btn.setEnabled(False)
         
-        try:
-            # 尝试加载模型
-            self.model = CosyVoice2(model_path, load_jit=False, load_trt=False, fp16=False)
-            self.model_loaded = True
-            self.synthesize_btn.setEnabled(True)
-            self.statusBar.showMessage(f"模型加载成功: {model_path}")
+        # 释放旧模型，避免多个模型同时占用显存
+        self.model_cache.clear()
+        self.model = None
+        self.model_loaded = False
+        
+        self.model_loader = ModelLoaderThread(model_path, load_jit, load_trt, load_vllm, fp16)
+        self.model_loader.progress.connect(self.statusBar.showMessage)
+        self.model_loader.model_ready.connect(
+            lambda model: self.model_loaded_finished(model, cache_key, notify))
+        self.model_loader.error.connect(lambda message: self.model_load_failed(message, notify))
+        self.model_loader.start()
+        
+    def model_loaded_finished(self, model, cache_key, notify):
+        """模型加载完成处理"""
+        self.model_cache[cache_key] = model
+        self.model = model
+        # 换成新的字典而不是清空，仍在进行的旧模型合成任务写入的是它自己的那一份
+        self.prompt_cache = OrderedDict()
+        self.model_loaded = True
+        self.synthesize_btn.setEnabled(True)
+        self.load_model_btn.setEnabled(True)
+        self.statusBar.showMessage(f"模型加载成功: {cache_key[0]}")
+        if notify:
             QMessageBox.information(self, "成功", "CosyVoice模型加载成功!")
-        except Exception as e:
-            self.statusBar.showMessage(f"模型加载失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"模型加载失败: {str(e)}")
-        finally:
-            self.load_model_btn.setEnabled(True)
+            
+    def model_load_failed(self, message, notify):
+        """模型加载失败处理"""
+        self.load_model_btn.setEnabled(True)
+        self.statusBar.showMessage(f"模型加载失败: {message}")
+        if notify:
+            QMessageBox.critical(self, "错误", f"模型加载失败: {message}")
             
     def select_prompt_file(self):
         """选择参考音频文件"""
@@ -501,6 +1036,19 @@ class CosyVoiceGUI(QMainWindow):
         if file_path:
             self.prompt_file_edit.setText(file_path)
             
+    def cached_input(self, name):
+        """返回输入框去除首尾空白后的内容，仅在内容变化后重新读取"""
+        if name in self.dirty_inputs:
+            widget = self.input_widgets[name]
+            text = widget.toPlainText() if isinstance(widget, QTextEdit) else widget.text()
+            self.input_values[name] = text.strip()
+            self.dirty_inputs.discard(name)
+        return self.input_values[name]
+        
+    def on_prompt_file_changed(self, text):
+        """参考音频路径变化时检查文件是否存在"""
+        self._prompt_ok = Path(text.strip()).is_file()
+        
     def on_source_changed(self):
         """处理音频来源切换"""
         if self.builtin_radio.isChecked():
@@ -511,8 +1059,9 @@ class CosyVoiceGUI(QMainWindow):
             selected_voice = self.builtin_combo.currentText()
             if selected_voice:
                 voice_info = self.voice_mapping.get(selected_voice)
-                if voice_info and voice_info['txt']:
-                    self.prompt_text_edit.setText(voice_info['txt'])
+                prompt_text = load_prompt_txt(voice_info['txt_path']) if voice_info and voice_info['txt_path'] else ""
+                if prompt_text:
+                    self.prompt_text_edit.setText(prompt_text)
                 
                 # 设置内置音色文件路径
                 if voice_info:
@@ -532,7 +1081,7 @@ class CosyVoiceGUI(QMainWindow):
             return
             
         # 获取合成参数
-        text = self.text_edit.toPlainText().strip()
+        text = self.cached_input("text")
         if not text:
             QMessageBox.warning(self, "警告", "请输入要合成的文本")
             return
@@ -543,10 +1092,10 @@ class CosyVoiceGUI(QMainWindow):
             voice_info = self.voice_mapping.get(selected_voice)
             if voice_info:
                 prompt_file = os.path.join(os.path.dirname(__file__), "AudioSamples", voice_info['wav'])
-            prompt_text = self.prompt_text_edit.text().strip()
+            prompt_text = self.cached_input("prompt_text")
         else:
-            prompt_file = self.prompt_file_edit.text().strip()
-            prompt_text = self.prompt_text_edit.text().strip()
+            prompt_file = self.cached_input("prompt_file")
+            prompt_text = self.cached_input("prompt_text")
 
         print("prompt_text"+str(prompt_text))
         print("prompt_file"+str(prompt_file))
@@ -554,70 +1103,151 @@ class CosyVoiceGUI(QMainWindow):
             QMessageBox.warning(self, "警告", "请选择参考音频文件")
             return
             
-        if not os.path.exists(prompt_file):
+        # 内置音色来自启动时扫描到的文件，自定义路径在输入变化时已检查过
+        if self.custom_radio.isChecked() and not self._prompt_ok:
             QMessageBox.warning(self, "警告", f"参考音频文件不存在: {prompt_file}")
             return
             
         # 确定合成模式
-        if self.zero_shot_radio.isChecked():
-            mode = "zero_shot"
-            prompt_text = self.prompt_text_edit.text().strip()
-            if not prompt_text:
-                QMessageBox.warning(self, "警告", "零样本克隆模式需要输入参考文本")
-                return
-        elif self.cross_lingual_radio.isChecked():
-            mode = "cross_lingual"
-            prompt_text = ""  # 跨语言模式不需要参考文本
-        elif self.instruct_radio.isChecked():
-            mode = "instruct"
-            prompt_text = ""  # 指令模式不需要参考文本
-            instruct_text = self.instruct_text_edit.text().strip()
-            if not instruct_text:
-                QMessageBox.warning(self, "警告", "指令模式需要输入指令文本")
-                return
-        else:
+        mode_info = self.mode_table.get(self.mode_group.checkedButton())
+        if mode_info is None:
             QMessageBox.warning(self, "警告", "请选择合成模式")
             return
+        mode, required_input, required_hint = mode_info
+        if required_input is not None and not self.cached_input(required_input):
+            QMessageBox.warning(self, "警告", required_hint)
+            return
             
-        # 创建输出目录
-        output_dir = os.path.join(current_dir, "synthesis_outputs")
-        
-        # 禁用UI控件，防止重复操作
+        # 禁用UI控件，防止重复操作；合成过程中不允许切换模型
         self.synthesize_btn.setEnabled(False)
+        self.load_model_btn.setEnabled(False)
+        self.synthesizing = True
         self.statusBar.showMessage("正在合成语音，请稍候...")
         
-        # 创建并启动合成线程
-        self.synthesis_thread = SynthesisThread(
+        if self.stream_check.isChecked():
+            self.start_stream_playback(self.model.sample_rate)
+        
+        # 提交给常驻的合成线程
+        self.synthesis_worker.submit(SynthesisJob(
             self.model,
             mode,
             text,
             prompt_file,
-            self.prompt_text_edit.text().strip(),
-            self.instruct_text_edit.text().strip(),
-            output_dir
-        )
-        
-        self.synthesis_thread.progress.connect(self.update_status)
-        self.synthesis_thread.error.connect(self.show_error)
-        self.synthesis_thread.finished.connect(self.synthesis_finished)
+            prompt_text,
+            self.cached_input("instruct_text"),
+            self.output_dir,
+            self.prompt_cache,
+            self.batch_size_spin.value(),
+            self.segment_length_spin.value(),
+            self.stream_check.isChecked()
+        ))
+        
+    def start_stream_playback(self, sample_rate):
+        """准备流式播放，合成线程产生的音频块会被推送到音频输出"""
+        self.start_pcm_output(AudioStreamDevice(), sample_rate)
+        self.streaming = True
+        self.stream_chunks = []
+        self.stream_sample_rate = sample_rate
+        
+    def start_pcm_output(self, device, sample_rate):
+        """从给定的数据源播放16位单声道PCM，采样率随音频数据一起保存，不依赖当前加载的模型"""
+        self.stop_stream_playback()
+        self.player.stop()
         
-        self.synthesis_thread.start()
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(sample_rate)
+        audio_format.setChannelCount(1)
+        audio_format.setSampleSize(16)
+        audio_format.setCodec("audio/pcm")
+        audio_format.setByteOrder(QAudioFormat.LittleEndian)
+        audio_format.setSampleType(QAudioFormat.SignedInt)
+        
+        self.stream_device = device
+        self.audio_output = QAudioOutput(audio_format, self)
+        self.audio_output.stateChanged.connect(self.stream_state_changed)
+        self.audio_output.start(self.stream_device)
+        self.play_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
         
+    def stop_stream_playback(self):
+        """停止PCM播放并释放音频输出"""
+        if self.audio_output is not None:
+            self.audio_output.stateChanged.disconnect(self.stream_state_changed)
+            self.audio_output.stop()
+            self.audio_output.deleteLater()
+            self.audio_output = None
+        if self.stream_device is not None:
+            self.stream_device.close()
+            self.stream_device = None
+            
+    def on_audio_chunk(self, chunk):
+        """接收流式合成的音频块"""
+        if not self.streaming:
+            return
+        self.stream_chunks.append(chunk)
+        if self.stream_device is not None:
+            self.stream_device.append(chunk.tobytes())
+            
+    def on_audio_ready(self, output_path, sample_rate, pcm_segments):
+        """保存合成音频的PCM片段，供播放时直接使用"""
+        self.current_pcm = (output_path, sample_rate, pcm_segments)
+            
+    def stream_state_changed(self, state):
+        """流式播放状态变化处理"""
+        # 合成已结束且缓冲数据播放完毕
+        if state == QAudio.IdleState and self.stream_device is not None and self.stream_device.atEnd():
+            self.stop_stream_playback()
+            self.play_btn.setEnabled(True)
+            self.stop_btn.setEnabled(False)
+            self.statusBar.showMessage("播放完成")
+            
     def update_status(self, message):
         """更新状态信息到日志输出框"""
-        self.log_text.append(message)
+        self.pending_logs.append(message)
+        if not self.log_timer.isActive():
+            self.log_timer.start()
+            
+    def flush_log(self):
+        """把缓存的日志一次性写入日志输出框"""
+        self.log_timer.stop()
+        if self.pending_logs:
+            self.log_text.append("\n".join(self.pending_logs))
+            self.pending_logs = []
         
     def show_error(self, error_message):
         """显示错误消息"""
         error_msg = f"错误: {error_message}"
+        self.flush_log()
         self.log_text.append(error_msg)
         QMessageBox.critical(self, "错误", error_message)
         self.synthesize_btn.setEnabled(True)
+        self.load_model_btn.setEnabled(True)
+        self.synthesizing = False
+        if self.streaming:
+            self.streaming = False
+            self.stream_chunks = []
+            if self.stream_device is not None:
+                self.stream_device.finish()
         
     def synthesis_finished(self, output_path):
         """合成完成处理"""
         self.current_audio_path = output_path
         self.synthesize_btn.setEnabled(True)
+        self.load_model_btn.setEnabled(True)
+        self.synthesizing = False
+        
+        # 流式播放时音频已在播放，等待缓冲数据播放完毕即可
+        if self.streaming:
+            self.streaming = False
+            if self.stream_chunks:
+                self.current_pcm = (output_path, self.stream_sample_rate, self.stream_chunks)
+            self.stream_chunks = []
+            if self.stream_device is not None:
+                self.stream_device.finish()
+                if self.audio_output.state() == QAudio.IdleState:
+                    self.stream_state_changed(QAudio.IdleState)
+            return
+        
         self.play_btn.setEnabled(True)
         
         # 自动播放合成的语音
@@ -628,6 +1258,17 @@ class CosyVoiceGUI(QMainWindow):
         if not self.current_audio_path or not os.path.exists(self.current_audio_path):
             QMessageBox.warning(self, "警告", "没有可播放的音频文件")
             return
+        
+        if self.current_pcm is not None and self.current_pcm[0] == self.current_audio_path:
+            # 合成的音频已在内存中，直接播放PCM数据
+            _, sample_rate, pcm_chunks = self.current_pcm
+            device = AudioStreamDevice()
+            for chunk in pcm_chunks:
+                device.append(chunk.tobytes())
+            device.finish()
+            self.start_pcm_output(device, sample_rate)
+            self.statusBar.showMessage(f"正在播放: {self.current_audio_path}")
+            return
             
         self.player.setMedia(QMediaContent(QUrl.fromLocalFile(self.current_audio_path)))
         self.player.play()
@@ -635,9 +1276,6 @@ class CosyVoiceGUI(QMainWindow):
         self.stop_btn.setEnabled(True)
         self.statusBar.showMessage(f"正在播放: {self.current_audio_path}")
         
-        # 播放结束后恢复按钮状态
-        self.player.stateChanged.connect(self.player_state_changed)
-        
     def preview_builtin_voice(self):
         """试听内置音色"""
         selected_voice = self.builtin_combo.currentText()
@@ -663,6 +1301,7 @@ class CosyVoiceGUI(QMainWindow):
     def stop_audio(self):
         """停止播放音频"""
         self.player.stop()
+        self.stop_stream_playback()
         self.play_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.statusBar.showMessage("播放已停止")
@@ -676,15 +1315,31 @@ class CosyVoiceGUI(QMainWindow):
     
     def open_output_directory(self):
         """打开合成输出目录"""
-        output_dir = os.path.join(current_dir, "synthesis_outputs")
-        os.makedirs(output_dir, exist_ok=True)
-        os.startfile(output_dir)
+        # 输出目录已在启动时创建，这里直接用系统文件管理器打开
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(self.output_dir)))
             
     def closeEvent(self, event):
         """应用关闭时的处理"""
         self.player.stop()
+        self.stop_stream_playback()
+        # 模型加载和合成都无法中途取消，等待其结束后再退出，避免销毁仍在运行的线程
+        if self.model_loader is not None and self.model_loader.isRunning():
+            self.show_exit_status("正在等待模型加载完成，完成后将自动退出...")
+            self.model_loader.wait()
+        self.synthesis_worker.stop()
+        if self.synthesizing:
+            self.show_exit_status("正在等待当前合成任务结束，完成后将自动退出...")
+        self.synthesis_worker.wait()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
         event.accept()
         
+    def show_exit_status(self, message):
+        """退出前等待后台线程时，在状态栏提示界面暂时无响应的原因"""
+        self.statusBar.showMessage(message)
+        # 等待期间事件循环被阻塞，先处理一次事件让提示显示出来
+        QApplication.processEvents()
+        
     def on_mode_changed(self, button):
         """处理合成模式切换"""
         # 根据选择的模式显示/隐藏相关控件
@@ -3,37 +3,98 @@
 
 import os
 import sys
+import codecs
+import json
+import locale
 import subprocess
+import threading
 import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    # Windows下没有fcntl，无法使用reflink
+    fcntl = None
+
+# Linux的FICLONE ioctl编号，用于在btrfs/XFS等写时复制文件系统上克隆文件
+FICLONE = 0x40049409
+
 
 def run_command(cmd):
     """运行命令并实时显示输出"""
     print(f"执行命令: {cmd}")
+    sys.stdout.flush()
     process = subprocess.Popen(
         cmd, 
         shell=True, 
         stdout=subprocess.PIPE, 
-        stderr=subprocess.STDOUT,
-        universal_newlines=True
+        stderr=subprocess.STDOUT
     )
     
-    for line in process.stdout:
-        print(line.strip())
+    # 由后台线程每100毫秒刷新一次标准输出，避免pip进度条的大量小块输出逐次刷新终端
+    stop_flush = threading.Event()
+    
+    def flush_periodically():
+        while not stop_flush.wait(0.1):
+            sys.stdout.buffer.flush()
     
+    flusher = threading.Thread(target=flush_periodically, daemon=True)
+    flusher.start()
+    
+    # 按块读取原始字节写到标准输出，不逐行解码和打印
+    # 子进程按区域设置的编码（如Windows下的cp936）输出，与标准输出编码不同时需转码，否则中文会乱码
+    child_encoding = locale.getpreferredencoding(False)
+    stdout_encoding = sys.stdout.encoding or child_encoding
+    decoder = None
+    if codecs.lookup(child_encoding).name != codecs.lookup(stdout_encoding).name:
+        decoder = codecs.getincrementaldecoder(child_encoding)(errors='replace')
+    fd = process.stdout.fileno()
+    try:
+        while True:
+            chunk = os.read(fd, 1 << 16)
+            if decoder is not None:
+                # 增量解码器会保留被块边界截断的多字节字符，留到下一块再解码
+                sys.stdout.buffer.write(decoder.decode(chunk, final=not chunk).encode(stdout_encoding, 'replace'))
+            elif chunk:
+                sys.stdout.buffer.write(chunk)
+            if not chunk:
+                break
+    finally:
+        stop_flush.set()
+        flusher.join()
+        sys.stdout.buffer.flush()
+    
+    process.stdout.close()
     process.wait()
     return process.returncode
 
 
+def conda_env_exists(name):
+    """检查指定名称的conda环境是否存在"""
+    # Windows下PATH中的conda通常是condabin\conda.bat，不经过shell时需要先解析出完整路径才能启动
+    conda = shutil.which("conda")
+    if conda is None:
+        return False
+    # 直接解析JSON输出，不经过shell和grep；无法运行conda或输出无法解析时按环境不存在处理
+    try:
+        result = subprocess.run([conda, "env", "list", "--json"], capture_output=True, text=True)
+        if result.returncode != 0:
+            return False
+        envs = json.loads(result.stdout).get("envs", [])
+    except (OSError, ValueError):
+        return False
+    return name in {Path(env).name for env in envs}
+
+
 def setup_environment():
     """设置conda环境"""
     print("正在设置conda环境...")
     
     # 检查conda环境是否存在
-    result = subprocess.run("conda env list | grep cosyvoice", shell=True, capture_output=True, text=True)
-    if "cosyvoice" in result.stdout:
+    if conda_env_exists("cosyvoice"):
         print("cosyvoice环境已存在，跳过创建步骤")
     else:
         # 创建conda环境
@@ -54,6 +115,82 @@ def setup_environment():
     print("环境设置完成")
 
 
+def reflink_file(fsrc, fdst):
+    """在支持写时复制的文件系统上克隆文件，成功返回True"""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def copy_file_in_kernel(fsrc, fdst):
+    """使用copy_file_range在内核中复制文件数据，成功返回True"""
+    if not hasattr(os, "copy_file_range"):
+        return False
+    remaining = os.fstat(fsrc.fileno()).st_size
+    try:
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    except OSError:
+        return False
+    return remaining == 0
+
+
+def copy_model_file(src, dst):
+    """复制单个模型文件，优先克隆或在内核中复制，避免数据经过用户空间"""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        copied = reflink_file(fsrc, fdst) or copy_file_in_kernel(fsrc, fdst)
+    if copied:
+        shutil.copystat(src, dst)
+    else:
+        # 回退到普通复制，copy2会重新打开并截断目标文件
+        shutil.copy2(src, dst)
+    return dst
+
+
+def copy_model_tree(src, dst):
+    """递归复制模型目录，用os.scandir遍历，目录项自带类型信息，不必逐个stat"""
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as entries:
+        for entry in entries:
+            target = os.path.join(dst, entry.name)
+            if entry.is_dir():
+                copy_model_tree(entry.path, target)
+            else:
+                copy_model_file(entry.path, target)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def link_model_file(file_path, target_dir):
+    """链接或复制单个模型文件或目录到目标目录"""
+    target_path = target_dir / file_path.name
+    
+    # 如果目标已存在，先删除
+    if target_path.exists():
+        if target_path.is_symlink() or target_path.is_file():
+            target_path.unlink()
+        elif target_path.is_dir():
+            shutil.rmtree(target_path)
+    
+    # 尝试创建符号链接，如果失败则复制文件
+    try:
+        target_path.symlink_to(file_path)
+        print(f"已创建符号链接: {target_path} -> {file_path}")
+    except (OSError, NotImplementedError):
+        if file_path.is_dir():
+            copy_model_tree(file_path, target_path)
+        else:
+            copy_model_file(file_path, target_path)
+        print(f"已复制: {file_path} -> {target_path}")
+
+
 def link_model_files(model_path):
     """链接或复制外部模型文件到项目目录"""
     print(f"正在链接模型文件从 {model_path}...")
@@ -69,27 +206,12 @@ def link_model_files(model_path):
         print(f"警告: 在 {model_path} 中没有找到模型文件")
         return
     
-    # 链接或复制每个文件
-    for file_path in model_files:
-        target_path = target_dir / file_path.name
-        
-        # 如果目标已存在，先删除
-        if target_path.exists():
-            if target_path.is_symlink() or target_path.is_file():
-                target_path.unlink()
-            elif target_path.is_dir():
-                shutil.rmtree(target_path)
-        
-        # 尝试创建符号链接，如果失败则复制文件
-        try:
-            target_path.symlink_to(file_path)
-            print(f"已创建符号链接: {target_path} -> {file_path}")
-        except (OSError, NotImplementedError):
-            if file_path.is_dir():
-                shutil.copytree(file_path, target_path)
-            else:
-                shutil.copy2(file_path, target_path)
-            print(f"已复制: {file_path} -> {target_path}")
+    # 链接或复制每个文件，各文件互不相关，需要复制大文件时并行进行以充分利用磁盘带宽
+    max_workers = min(len(model_files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(link_model_file, file_path, target_dir) for file_path in model_files]
+        for future in futures:
+            future.result()
     
     print("模型文件链接完成")
 
@@ -5,37 +5,72 @@ import os
 import sys
 import argparse
 import time
-from pathlib import Path
-import torchaudio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import torch
 import numpy as np
-import soundfile as sf
 
 # 添加Matcha-TTS依赖
 sys.path.append('./third_party/Matcha-TTS')
 
-# 导入CosyVoice相关模块
-from cosyvoice.cli.cosyvoice import CosyVoice2
-from cosyvoice.utils.file_utils import load_wav
+# 共用的辅助函数只依赖torch和numpy，直接导入
+from cosyvoice.utils.inference_utils import detect_acceleration, to_pcm16, warmup_model
+
+# CosyVoice相关模块初始化较慢，在首次加载模型或音频时才导入，--help等无需推理的调用不必等待
+
+
+@lru_cache(maxsize=8)
+def load_prompt_wav(path, sample_rate):
+    """读取并重采样参考音频，各项测试使用同一文件时只解码一次"""
+    from cosyvoice.utils.file_utils import load_wav
+    return load_wav(path, sample_rate)
+
+
+@lru_cache(maxsize=1)
+def load_model(model_dir, load_jit=False, load_trt=False, load_vllm=False, fp16=False, bf16=False):
+    """加载CosyVoice2模型，同一进程内重复调用时复用已加载的模型"""
+    from cosyvoice.cli.cosyvoice import CosyVoice2
+    model = CosyVoice2(model_dir, load_jit=load_jit, load_trt=load_trt, load_vllm=load_vllm, fp16=fp16)
+    # BF16只作用于语言模型，flow和声码器保持原精度，避免音质损失
+    if bf16 and not fp16 and torch.cuda.is_available() and torch.cuda.is_bf16_supported():
+        model.model.llm.to(torch.bfloat16)
+    return model
+
+
+@torch.inference_mode()
+def register_prompts(model, prompt_file, prompt_text, instruct_text):
+    """只提取一次参考音频特征并注册为说话人，返回(零样本/跨语言使用的ID, 指令控制使用的ID)"""
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
+    prompt_text = model.frontend.text_normalize(prompt_text, split=False, text_frontend=True)
+    model.add_zero_shot_spk(prompt_text, prompt_speech_16k, 'test_prompt')
+    
+    # 指令控制只是提示文本不同，复用已提取的语音特征
+    instruct_input = dict(model.frontend.spk2info['test_prompt'])
+    instruct_input['prompt_text'], instruct_input['prompt_text_len'] = \
+        model.frontend._extract_text_token(instruct_text + '<|endofprompt|>')
+    model.frontend.spk2info['test_instruct'] = instruct_input
+    return 'test_prompt', 'test_instruct'
 
 
 def save_audio(speech, sample_rate, output_path):
     """保存音频文件"""
     # 确保输出目录存在
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_audio(speech, sample_rate, output_path)
+
+
+def write_audio(speech, sample_rate, output_path):
+    """保存音频文件到已存在的目录，供流式合成中逐个chunk调用"""
+    import soundfile as sf
+    if speech.dtype != np.int16:
+        speech = to_pcm16(speech)
     
-    # 保存音频
-    if isinstance(speech, torch.Tensor):
-        speech = speech.squeeze().cpu().numpy()
-    
-    if len(speech.shape) > 1 and speech.shape[0] == 1:
-        speech = speech.squeeze(0)
-    
-    sf.write(output_path, speech, sample_rate)
+    sf.write(output_path, speech, sample_rate, subtype='PCM_16')
     print(f"已保存音频文件到: {output_path}")
 
 
-def test_zero_shot(model, text, prompt_file, prompt_text, output_dir):
+@torch.inference_mode()
+def test_zero_shot(model, text, prompt_file, prompt_text, output_dir, zero_shot_spk_id=''):
     """测试零样本语音克隆"""
     print(f"\n===== 测试零样本语音克隆 =====")
     print(f"合成文本: {text}")
@@ -43,14 +78,15 @@ def test_zero_shot(model, text, prompt_file, prompt_text, output_dir):
     print(f"参考文本: {prompt_text}")
     
     # 加载参考音频
-    prompt_speech_16k = load_wav(prompt_file, 16000)
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
     
     # 生成输出路径
     output_path = os.path.join(output_dir, "zero_shot_output.wav")
     
     # 执行推理
     start_time = time.time()
-    for i, result in enumerate(model.inference_zero_shot(text, prompt_text, prompt_speech_16k, stream=False)):
+    for i, result in enumerate(model.inference_zero_shot(text, prompt_text, prompt_speech_16k,
+                                                         zero_shot_spk_id=zero_shot_spk_id, stream=False)):
         # 仅保存第一个输出（多个batch场景）
         if i == 0:
             save_audio(result['tts_speech'], model.sample_rate, output_path)
@@ -60,21 +96,23 @@ def test_zero_shot(model, text, prompt_file, prompt_text, output_dir):
     print(f"零样本语音克隆完成，耗时: {elapsed:.2f}秒")
     
 
-def test_cross_lingual(model, text, prompt_file, output_dir):
+@torch.inference_mode()
+def test_cross_lingual(model, text, prompt_file, output_dir, zero_shot_spk_id=''):
     """测试跨语言语音克隆"""
     print(f"\n===== 测试跨语言语音克隆 =====")
     print(f"合成文本: {text}")
     print(f"参考音频: {prompt_file}")
     
     # 加载参考音频
-    prompt_speech_16k = load_wav(prompt_file, 16000)
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
     
     # 生成输出路径
     output_path = os.path.join(output_dir, "cross_lingual_output.wav")
     
     # 执行推理
     start_time = time.time()
-    for i, result in enumerate(model.inference_cross_lingual(text, prompt_speech_16k, stream=False)):
+    for i, result in enumerate(model.inference_cross_lingual(text, prompt_speech_16k,
+                                                             zero_shot_spk_id=zero_shot_spk_id, stream=False)):
         # 仅保存第一个输出（多个batch场景）
         if i == 0:
             save_audio(result['tts_speech'], model.sample_rate, output_path)
@@ -84,21 +122,23 @@ def test_cross_lingual(model, text, prompt_file, output_dir):
     print(f"跨语言语音克隆完成，耗时: {elapsed:.2f}秒")
 
 
-def test_fine_grained_control(model, text, prompt_file, output_dir):
+@torch.inference_mode()
+def test_fine_grained_control(model, text, prompt_file, output_dir, zero_shot_spk_id=''):
     """测试精细控制合成"""
     print(f"\n===== 测试精细控制合成 =====")
     print(f"合成文本: {text}")
     print(f"参考音频: {prompt_file}")
     
     # 加载参考音频
-    prompt_speech_16k = load_wav(prompt_file, 16000)
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
     
     # 生成输出路径
     output_path = os.path.join(output_dir, "fine_grained_control_output.wav")
     
     # 执行推理
     start_time = time.time()
-    for i, result in enumerate(model.inference_cross_lingual(text, prompt_speech_16k, stream=False)):
+    for i, result in enumerate(model.inference_cross_lingual(text, prompt_speech_16k,
+                                                             zero_shot_spk_id=zero_shot_spk_id, stream=False)):
         # 仅保存第一个输出（多个batch场景）
         if i == 0:
             save_audio(result['tts_speech'], model.sample_rate, output_path)
@@ -108,7 +148,8 @@ def test_fine_grained_control(model, text, prompt_file, output_dir):
     print(f"精细控制合成完成，耗时: {elapsed:.2f}秒")
 
 
-def test_instruct(model, text, instruct, prompt_file, output_dir):
+@torch.inference_mode()
+def test_instruct(model, text, instruct, prompt_file, output_dir, zero_shot_spk_id=''):
     """测试指令控制语音合成"""
     print(f"\n===== 测试指令控制语音合成 =====")
     print(f"合成文本: {text}")
@@ -116,14 +157,15 @@ def test_instruct(model, text, instruct, prompt_file, output_dir):
     print(f"参考音频: {prompt_file}")
     
     # 加载参考音频
-    prompt_speech_16k = load_wav(prompt_file, 16000)
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
     
     # 生成输出路径
     output_path = os.path.join(output_dir, "instruct_output.wav")
     
     # 执行推理
     start_time = time.time()
-    for i, result in enumerate(model.inference_instruct2(text, instruct, prompt_speech_16k, stream=False)):
+    for i, result in enumerate(model.inference_instruct2(text, instruct, prompt_speech_16k,
+                                                         zero_shot_spk_id=zero_shot_spk_id, stream=False)):
         # 仅保存第一个输出（多个batch场景）
         if i == 0:
             save_audio(result['tts_speech'], model.sample_rate, output_path)
@@ -133,40 +175,48 @@ def test_instruct(model, text, instruct, prompt_file, output_dir):
     print(f"指令控制语音合成完成，耗时: {elapsed:.2f}秒")
 
 
-def test_streaming(model, text, prompt_file, prompt_text, output_dir):
+@torch.inference_mode()
+def test_streaming(model, text, prompt_file, prompt_text, output_dir, zero_shot_spk_id=''):
     """测试流式语音合成"""
+    import soundfile as sf
     print(f"\n===== 测试流式语音合成 =====")
     print(f"合成文本: {text}")
     print(f"参考音频: {prompt_file}")
     print(f"参考文本: {prompt_text}")
     
     # 加载参考音频
-    prompt_speech_16k = load_wav(prompt_file, 16000)
+    prompt_speech_16k = load_prompt_wav(prompt_file, 16000)
     
     # 生成输出路径
     output_dir = os.path.join(output_dir, "streaming")
     os.makedirs(output_dir, exist_ok=True)
     
-    # 执行推理
+    # 执行推理，每个chunk到达时同时追加写入合并文件，不必缓存所有chunk再拼接
     start_time = time.time()
-    chunks = []
-    for i, result in enumerate(model.inference_zero_shot(text, prompt_text, prompt_speech_16k, stream=True)):
-        chunk_path = os.path.join(output_dir, f"chunk_{i}.wav")
-        save_audio(result['tts_speech'], model.sample_rate, chunk_path)
-        chunks.append(result['tts_speech'])
-    
-    # 合并所有chunk
-    if chunks:
-        combined = torch.cat(chunks, dim=1)
-        combined_path = os.path.join(output_dir, "combined_streaming.wav")
-        save_audio(combined, model.sample_rate, combined_path)
+    combined_path = os.path.join(output_dir, "combined_streaming.wav")
+    # 写文件交给单个后台线程按顺序完成，不阻塞下一个chunk的合成；合并文件在写线程结束后才关闭
+    with sf.SoundFile(combined_path, 'w', samplerate=model.sample_rate, channels=1, subtype='PCM_16') as combined_file, \
+            ThreadPoolExecutor(max_workers=1) as writer:
+        writes = []
+        for i, result in enumerate(model.inference_zero_shot(text, prompt_text, prompt_speech_16k,
+                                                             zero_shot_spk_id=zero_shot_spk_id, stream=True)):
+            # 输出目录已在循环前创建，每个chunk只量化一次；量化结果是新数组，可直接交给写线程
+            speech = to_pcm16(result['tts_speech'])
+            chunk_path = os.path.join(output_dir, f"chunk_{i}.wav")
+            writes.append(writer.submit(write_audio, speech, model.sample_rate, chunk_path))
+            writes.append(writer.submit(combined_file.write, speech))
+        # 等待所有写入完成，写入出错时在这里抛出
+        for future in writes:
+            future.result()
+    print(f"已保存音频文件到: {combined_path}")
     
     # 计算耗时
     elapsed = time.time() - start_time
     print(f"流式语音合成完成，耗时: {elapsed:.2f}秒")
 
 
-def run_all_tests(model_dir, output_dir, prompt_file=None):
+def run_all_tests(model_dir, output_dir, prompt_file=None, fp16=False, bf16=False, load_jit=None, load_trt=None,
+                  load_vllm=False, parallel=False):
     """运行所有测试"""
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
@@ -179,9 +229,21 @@ def run_all_tests(model_dir, output_dir, prompt_file=None):
             print(f"错误: 未找到参考音频文件 {prompt_file}")
             return
     
-    print(f"加载CosyVoice2模型: {model_dir}")
+    # 未指定时根据模型目录中已有的文件决定是否启用JIT和TensorRT
+    detected_jit, detected_trt = detect_acceleration(model_dir, fp16)
+    load_jit = detected_jit if load_jit is None else load_jit
+    load_trt = detected_trt if load_trt is None else load_trt
+    
+    print(f"加载CosyVoice2模型: {model_dir} (JIT: {load_jit}, TensorRT: {load_trt}, vLLM: {load_vllm})")
     try:
-        model = CosyVoice2(model_dir, load_jit=False, load_trt=False, fp16=False)
+        try:
+            model = load_model(model_dir, load_jit=load_jit, load_trt=load_trt, load_vllm=load_vllm, fp16=fp16, bf16=bf16)
+        except Exception as e:
+            if not (load_jit or load_trt or load_vllm):
+                raise
+            # 加速组件不可用时退回原始的PyTorch推理
+            print(f"警告: 加载JIT/TensorRT/vLLM失败 - {e}，改用PyTorch推理")
+            model = load_model(model_dir, fp16=fp16, bf16=bf16)
         print("模型加载成功")
     except Exception as e:
         print(f"错误: 模型加载失败 - {e}")
@@ -198,12 +260,29 @@ def run_all_tests(model_dir, output_dir, prompt_file=None):
     # 指令文本
     instruct_text = "用四川话说这句话"
     
+    # 预热模型，之后各项测试统计的是稳定状态下的耗时
+    print("正在预热模型...")
+    warmup_model(model, load_prompt_wav(prompt_file, 16000), prompt_text)
+    
+    # 各项测试共用同一份参考音频特征
+    prompt_spk_id, instruct_spk_id = register_prompts(model, prompt_file, prompt_text, instruct_text)
+    
     # 运行各种测试
-    test_zero_shot(model, chinese_text, prompt_file, prompt_text, output_dir)
-    test_cross_lingual(model, english_text, prompt_file, output_dir)
-    test_fine_grained_control(model, emotion_text, prompt_file, output_dir)
-    test_instruct(model, chinese_text, instruct_text, prompt_file, output_dir)
-    test_streaming(model, chinese_text, prompt_file, prompt_text, output_dir)
+    tests = [
+        (test_zero_shot, (model, chinese_text, prompt_file, prompt_text, output_dir, prompt_spk_id)),
+        (test_cross_lingual, (model, english_text, prompt_file, output_dir, prompt_spk_id)),
+        (test_fine_grained_control, (model, emotion_text, prompt_file, output_dir, prompt_spk_id)),
+        (test_instruct, (model, chinese_text, instruct_text, prompt_file, output_dir, instruct_spk_id)),
+    ]
+    if parallel:
+        # 模型按会话隔离推理状态，非流式测试同时提交，各项耗时会相互影响
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            for future in [executor.submit(test, *args) for test, args in tests]:
+                future.result()
+    else:
+        for test, args in tests:
+            test(*args)
+    test_streaming(model, chinese_text, prompt_file, prompt_text, output_dir, prompt_spk_id)
     
     print(f"\n所有测试完成! 输出文件保存在: {output_dir}")
 
@@ -216,10 +295,24 @@ def main():
                         help="测试输出保存目录")
     parser.add_argument("--prompt_file", type=str, default=None,
                         help="参考音频文件路径(如果不提供，将使用默认音频)")
+    parser.add_argument("--fp16", action="store_true",
+                        help="使用FP16推理(需要CUDA)")
+    parser.add_argument("--bf16", action="store_true",
+                        help="语言模型使用BF16推理(需要支持BF16的GPU，与--fp16同时指定时使用FP16)")
+    parser.add_argument("--load_jit", action=argparse.BooleanOptionalAction, default=None,
+                        help="加载JIT编译的flow编码器(默认在模型目录中存在导出文件时启用)")
+    parser.add_argument("--load_trt", action=argparse.BooleanOptionalAction, default=None,
+                        help="使用TensorRT加速flow解码器(默认在引擎已构建时启用，指定后引擎缺失时会自动构建)")
+    parser.add_argument("--load_vllm", action="store_true",
+                        help="使用vLLM运行语言模型，解码步骤以CUDA Graph重放(需单独安装vllm)")
+    parser.add_argument("--parallel", action="store_true",
+                        help="同时运行各项非流式测试，缩短总耗时")
     
     args = parser.parse_args()
     
-    run_all_tests(args.model_dir, args.output_dir, args.prompt_file)
+    run_all_tests(args.model_dir, args.output_dir, args.prompt_file, fp16=args.fp16, bf16=args.bf16,
+                  load_jit=args.load_jit, load_trt=args.load_trt,
+                  load_vllm=args.load_vllm, parallel=args.parallel)
 
 
 if __name__ == "__main__":